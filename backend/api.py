@@ -1,23 +1,46 @@
+import csv
+import hashlib
+import io
+import threading
+import time
+from operator import attrgetter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import orjson
 import os
 from dotenv import load_dotenv
-from keycloak import KeycloakOpenID
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from keycloak.exceptions import KeycloakError
-from .models import User
+from .models import User, Group, Task, user_groups
 from .services import (
     db, create_task_service, create_group_service,
     get_tasks_for_user, get_groups_for_user,
     join_group_service, update_task_service,
-    get_or_create_user_from_keycloak, get_all_groups
+    get_or_create_user_from_keycloak, get_all_groups,
+    get_group_member_index, user_exists
+)
+from .auth import (
+    create_user, keycloak_protect, keycloak_admin,
+    keycloak_openid, set_user_password, update_user
 )
-from .auth import create_user, get_user_by_id, keycloak_protect, keycloak_admin, set_user_password, update_user
 
 # -----------------------------
 # App Initialization
 # -----------------------------
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson so jsonify serializes in C."""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NAIVE_UTC).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 load_dotenv()
 CORS(app, resources={r"/*": {"origins": "*"}})
 
@@ -28,76 +51,259 @@ POSTGRES_USER = os.getenv("POSTGRES_USER", "root")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "root")
 POSTGRES_DB = os.getenv("POSTGRES_DB", "StudyConnect")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
-POSTGRES_PORT = os.getenv("POSTGRES_PORT", 5432)
+POSTGRES_PORT = int(os.getenv("POSTGRES_PORT", 5432))
 
 app.config['SQLALCHEMY_DATABASE_URI'] = (
     f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}"
     f"@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 )
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Reuse pooled connections instead of re-opening one per request.
+# Sizes are env-tunable so they can be matched to the WSGI worker/thread count.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", 20)),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 20)),
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+    "pool_use_lifo": True,
+    # Roomy compiled-statement cache so hot queries skip SQL compilation.
+    "query_cache_size": 1200,
+}
 db.init_app(app)
 
-# -----------------------------
-# Keycloak Client
-# -----------------------------
-keycloak_openid = KeycloakOpenID(
-    server_url=os.getenv("KEYCLOAK_SERVER_URL"),
-    client_id=os.getenv("KEYCLOAK_CLIENT_ID"),
-    realm_name=os.getenv("KEYCLOAK_REALM"),
-    client_secret_key=os.getenv("KEYCLOAK_CLIENT_SECRET"),
-)
+# The Keycloak OpenID client is shared with auth.py (imported above);
+# constructing a second identical instance here bought nothing.
+
+# Short-TTL cache for userinfo() results: each call is a blocking HTTP
+# round-trip to Keycloak while access tokens stay valid for minutes.
+# Keyed by token digest so raw tokens are never held in memory.
+_USERINFO_TTL = 60  # seconds
+_USERINFO_MAX = 4096
+_userinfo_cache = {}
+_userinfo_lock = threading.Lock()
+
+def cached_userinfo(token):
+    """Like keycloak_openid.userinfo(), but memoized for a short TTL."""
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    now = time.monotonic()
+    with _userinfo_lock:
+        entry = _userinfo_cache.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+    userinfo = keycloak_openid.userinfo(token)
+    with _userinfo_lock:
+        if len(_userinfo_cache) >= _USERINFO_MAX:
+            _userinfo_cache.clear()
+        _userinfo_cache[key] = (now + _USERINFO_TTL, userinfo)
+    return userinfo
 
 # -----------------------------
 # Helpers
 # -----------------------------
+def current_user():
+    """Resolve the local User for the authenticated caller, once per request.
+
+    The result is cached on flask.g (request-scoped), so repeated lookups
+    within one handler don't re-hit the database.
+    """
+    if "kc_user" not in g:
+        g.kc_user = get_or_create_user_from_keycloak(request.user)
+    return g.kc_user
+
+def known_local_user(user_id):
+    """True once user_id is known to exist locally, memoized per request.
+
+    Same request-scoped caching pattern as current_user(): the existence
+    probe (and the Keycloak self-sync fallback) runs at most once per
+    user id per request, no matter how often handlers re-check it.
+    """
+    cache = getattr(g, "_known_users", None)
+    if cache is None:
+        cache = g._known_users = {}
+    if user_id in cache:
+        return cache[user_id]
+
+    known = user_exists(user_id)
+    if not known:
+        # Callers may legitimately ask about themselves before their first
+        # sync; pull them in from Keycloak once.
+        kc_userinfo = cached_userinfo(g.access_token)
+        if kc_userinfo.get("sub") == user_id:
+            get_or_create_user_from_keycloak(kc_userinfo)
+            known = True
+    cache[user_id] = known
+    return known
+
+def stream_json_list(items, to_dict):
+    """Stream a JSON array response one row at a time.
+
+    Avoids materializing the full list of dicts plus the full JSON byte
+    string in memory; peak usage stays at roughly one serialized row.
+    """
+    def generate():
+        yield b"["
+        first = True
+        for item in items:
+            chunk = orjson.dumps(to_dict(item))
+            yield chunk if first else b"," + chunk
+            first = False
+        yield b"]"
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+# Hoisted accessors: one C-level attrgetter call per row instead of eight
+# individual instrumented-attribute lookups inside the serialization loops.
+_TASK_GETTER = attrgetter(
+    "id", "title", "deadline", "kind", "priority", "status", "progress", "assignee"
+)
+_GROUP_GETTER = attrgetter("id", "name", "description", "group_number", "invite_link")
+
 def task_to_dict(t):
+    id_, title, deadline, kind, priority, status, progress, assignee = _TASK_GETTER(t)
+    group = t.group
     return {
-        "id": t.id,
-        "title": t.title,
-        "deadline": t.deadline.isoformat() if t.deadline else None,
-        "kind": t.kind,
-        "priority": t.priority,
-        "status": t.status,
-        "progress": t.progress,
-        "group": {"id": t.group.id, "name": t.group.name} if t.group else None,
-        "assignee": t.assignee,
+        "id": id_,
+        "title": title,
+        "deadline": deadline,  # orjson serializes dates natively
+        "kind": kind,
+        "priority": priority,
+        "status": status,
+        "progress": progress,
+        "group": {"id": group.id, "name": group.name} if group else None,
+        "assignee": assignee,
     }
 
-def group_to_dict(g):
-    members = [u.id for u in g.members] if g.members else []
+def task_row_to_dict(row):
+    """Like task_to_dict, but over the column tuples get_tasks_for_user returns."""
     return {
-        "id": g.id,
-        "name": g.name,
-        "description": g.description,
-        "groupNumber": g.group_number,
-        "inviteLink": g.invite_link,
+        "id": row.id,
+        "title": row.title,
+        "deadline": row.deadline,
+        "kind": row.kind,
+        "priority": row.priority,
+        "status": row.status,
+        "progress": row.progress,
+        "group": {"id": row.group_pk, "name": row.group_name} if row.group_pk is not None else None,
+        "assignee": row.assignee,
+    }
+
+def group_to_dict(g, members=None):
+    id_, name, description, group_number, invite_link = _GROUP_GETTER(g)
+    if members is None:
+        members = [u.id for u in g.members]
+    return {
+        "id": id_,
+        "name": name,
+        "description": description,
+        "groupNumber": group_number,
+        "inviteLink": invite_link,
         "members": members,
         "memberCount": len(members),
     }
 
+# The full group listing changes rarely but is polled often; serve the
+# already-serialized bytes from a short-TTL cache and drop it on writes.
+_GROUPS_TTL = 10  # seconds
+_groups_cache = {"body": None, "expires": 0.0}
+_groups_lock = threading.Lock()
+
+def _groups_cache_clear():
+    with _groups_lock:
+        _groups_cache["body"] = None
+
+def _groups_body():
+    """Serialized GET /api/groups payload, cached for up to _GROUPS_TTL."""
+    now = time.monotonic()
+    with _groups_lock:
+        if _groups_cache["body"] is not None and _groups_cache["expires"] > now:
+            return _groups_cache["body"]
+    # Member ids come from one scan of the membership table rather than
+    # hydrating every member User row per group.
+    member_index = get_group_member_index()
+    body = orjson.dumps([
+        group_to_dict(grp, member_index.get(grp.id, []))
+        for grp in get_all_groups()
+    ])
+    with _groups_lock:
+        _groups_cache["body"] = body
+        _groups_cache["expires"] = now + _GROUPS_TTL
+    return body
+
+def _tasks_etag(user_id):
+    """Weak content version for one user's task listings.
+
+    Cheap aggregates instead of hashing the payload: task state
+    (max updated_at + row count) plus group/membership state
+    (max groups.updated_at + user_groups row count), since joining a
+    group changes which tasks a user sees without touching any task row.
+    The caller's id is mixed in so tags never match across users; any
+    write over-invalidates, which only costs a full response, never
+    staleness or a cross-user 304.
+    """
+    version = db.session.execute(
+        select(
+            func.max(Task.updated_at),
+            func.count(Task.id),
+            select(func.max(Group.updated_at)).scalar_subquery(),
+            select(func.count()).select_from(user_groups).scalar_subquery(),
+        )
+    ).one()
+    return hashlib.blake2b(
+        repr((user_id, *version)).encode(), digest_size=8
+    ).hexdigest()
+
 # -----------------------------
 # Populate all Keycloak users into local DB
 # -----------------------------
+def _copy_users(rows):
+    """Bulk-load user rows via PostgreSQL COPY.
+
+    COPY bypasses per-row statement overhead entirely, which matters for
+    the startup sync on large realms. It has no conflict handling of its
+    own, so the data goes through a session-local temp table and an
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING into users.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow((row["id"], row["username"], row["email"]))
+    buf.seek(0)
+
+    conn = db.session.connection().connection
+    with conn.cursor() as cur:
+        cur.execute(
+            "CREATE TEMP TABLE _users_load "
+            "(LIKE users INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+        cur.copy_expert(
+            "COPY _users_load (id, username, email) FROM STDIN WITH (FORMAT csv)",
+            buf,
+        )
+        cur.execute(
+            "INSERT INTO users (id, username, email) "
+            "SELECT id, username, email FROM _users_load "
+            "ON CONFLICT (id) DO NOTHING"
+        )
+    db.session.commit()
+
+
 def populate_keycloak_users():
     with app.app_context():
         try:
             keycloak_users = keycloak_admin.get_users()
             print(f"Found {len(keycloak_users)} Keycloak users.")
-            created_count = 0
+            # One SELECT for the diff instead of one probe per Keycloak user.
+            existing_ids = {row[0] for row in db.session.query(User.id)}
+            rows = []
             for kc_user in keycloak_users:
                 user_id = kc_user.get("id") or kc_user.get("sub")
-                if not user_id:
+                if not user_id or user_id in existing_ids:
                     continue
-                # Updated to SQLAlchemy 2.x style
-                existing_user = db.session.get(User, user_id)
-                if not existing_user:
-                    username = kc_user.get("username") or kc_user.get("email")
-                    email = kc_user.get("email") or ""
-                    user = User(id=user_id, username=username, email=email)
-                    db.session.add(user)
-                    created_count += 1
-            db.session.commit()
-            print(f"Created {created_count} new users in local DB.")
+                username = kc_user.get("username") or kc_user.get("email")
+                email = kc_user.get("email") or ""
+                rows.append({"id": user_id, "username": username, "email": email})
+            if rows:
+                _copy_users(rows)
+            print(f"Created {len(rows)} new users in local DB.")
         except Exception as e:
             print(f"Error populating users: {e}")
 
@@ -129,12 +335,10 @@ def login():
 @keycloak_protect
 def get_user(user_id):
     try:
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         if not user:
             # Fetch Keycloak info dynamically
-            auth_header = request.headers.get("Authorization")
-            token = auth_header.split()[1]
-            kc_userinfo = keycloak_openid.userinfo(token)
+            kc_userinfo = cached_userinfo(g.access_token)
             if kc_userinfo.get("sub") == user_id:
                 user = get_or_create_user_from_keycloak(kc_userinfo)
             else:
@@ -154,18 +358,20 @@ def get_user(user_id):
 @keycloak_protect
 def get_tasks_for_specific_user(user_id):
     try:
-        user = User.query.get(user_id)
-        if not user:
-            auth_header = request.headers.get("Authorization")
-            token = auth_header.split()[1]
-            kc_userinfo = keycloak_openid.userinfo(token)
-            if kc_userinfo.get("sub") == user_id:
-                user = get_or_create_user_from_keycloak(kc_userinfo)
-            else:
-                return jsonify({"error": "User not found"}), 404
-
-        tasks = get_tasks_for_user(user.id)
-        return jsonify([task_to_dict(t) for t in tasks]), 200
+        # Only existence matters here; a one-column probe beats hydrating
+        # the full user row we'd never read.
+        if not known_local_user(user_id):
+            return jsonify({"error": "User not found"}), 404
+
+        etag = _tasks_etag(user_id)
+        if request.if_none_match.contains(etag):
+            return "", 304
+
+        tasks = get_tasks_for_user(user_id)
+        resp = stream_json_list(tasks, task_row_to_dict)
+        resp.headers["Vary"] = "Authorization"
+        resp.set_etag(etag)
+        return resp
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -173,18 +379,11 @@ def get_tasks_for_specific_user(user_id):
 @keycloak_protect
 def get_groups_for_specific_user(user_id):
     try:
-        user = User.query.get(user_id)
-        if not user:
-            auth_header = request.headers.get("Authorization")
-            token = auth_header.split()[1]
-            kc_userinfo = keycloak_openid.userinfo(token)
-            if kc_userinfo.get("sub") == user_id:
-                user = get_or_create_user_from_keycloak(kc_userinfo)
-            else:
-                return jsonify({"error": "User not found"}), 404
+        if not known_local_user(user_id):
+            return jsonify({"error": "User not found"}), 404
 
-        groups = get_groups_for_user(user.id)
-        return jsonify([group_to_dict(g) for g in groups]), 200
+        groups = get_groups_for_user(user_id)
+        return stream_json_list(groups, group_to_dict)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -195,7 +394,7 @@ def get_groups_for_specific_user(user_id):
 @keycloak_protect
 def create_task():
     data = request.json
-    kc_user = get_or_create_user_from_keycloak(request.user)
+    kc_user = current_user()
     data["user_id"] = kc_user.id  # string
     try:
         task = create_task_service(data)
@@ -206,9 +405,16 @@ def create_task():
 @app.route("/api/tasks", methods=["GET"])
 @keycloak_protect
 def get_tasks():
-    kc_user = get_or_create_user_from_keycloak(request.user)
+    kc_user = current_user()
+    etag = _tasks_etag(kc_user.id)
+    if request.if_none_match.contains(etag):
+        return "", 304
+
     tasks = get_tasks_for_user(kc_user.id)
-    return jsonify([task_to_dict(t) for t in tasks]), 200
+    resp = stream_json_list(tasks, task_row_to_dict)
+    resp.headers["Vary"] = "Authorization"
+    resp.set_etag(etag)
+    return resp
 
 @app.route("/api/groups", methods=["POST"])
 @keycloak_protect
@@ -216,6 +422,7 @@ def create_group():
     data = request.json
     try:
         group = create_group_service(data)
+        _groups_cache_clear()
         return jsonify({"message": "Group created", "group": group_to_dict(group)}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -225,8 +432,18 @@ def create_group():
 def get_all_groups_endpoint():
     """Return all groups for listing and joining."""
     try:
-        groups = get_all_groups()
-        return jsonify([group_to_dict(g) for g in groups]), 200
+        body = _groups_body()
+        # Content-addressed tag: identical payload bytes revalidate to 304.
+        etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+        if request.if_none_match.contains(etag):
+            return "", 304
+
+        resp = Response(body, mimetype="application/json")
+        # private: the endpoint requires Authorization, so shared caches
+        # must not store the response and replay it to other clients
+        resp.headers["Cache-Control"] = f"private, max-age={_GROUPS_TTL}"
+        resp.set_etag(etag)
+        return resp
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -235,11 +452,12 @@ def get_all_groups_endpoint():
 @keycloak_protect
 def join_group():
     data = request.json
-    kc_user = get_or_create_user_from_keycloak(request.user)
+    kc_user = current_user()
     group_id = data.get("group_id")
 
     try:
         group = join_group_service(kc_user.id, group_id)
+        _groups_cache_clear()
         return jsonify({
             "message": f"User {kc_user.id} joined group {group.name}",
             "group": group_to_dict(group)
@@ -316,37 +534,39 @@ def register_user():
         }
         result = create_user(payload)
         new_user_id = result if isinstance(result, str) else result.get("id")
-        kc_user = get_user_by_id(new_user_id)
-
-        # 2️⃣ Set password
-        set_user_password(new_user_id, password, temporary=False)
 
-        # 3️⃣ Remove required actions
-        update_user(new_user_id, {"requiredActions": []})
+        # 2️⃣ Set password and remove required actions — independent Keycloak
+        # calls, so run them concurrently instead of back to back
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            f_password = executor.submit(set_user_password, new_user_id, password, temporary=False)
+            f_actions = executor.submit(update_user, new_user_id, {"requiredActions": []})
+            f_password.result()
+            f_actions.result()
 
-        # 4️⃣ Optional: Add user to local DB
+        # 3️⃣ Optional: Add user to local DB (idempotent: a re-registration
+        # that already exists locally is a no-op rather than an error)
         birthday_date = (
             datetime.strptime(birthday, "%Y-%m-%d").date() if birthday else None
         )
-        user = User(
+        stmt = pg_insert(User.__table__).values(
             id=new_user_id,
             username=username,
             email=email,
             birthday=birthday_date,
-            faculty=faculty
-        )
-        db.session.add(user)
+            faculty=faculty,
+        ).on_conflict_do_nothing(index_elements=['id'])
+        db.session.execute(stmt)
         db.session.commit()
 
         return jsonify({
             "message": "User registered successfully",
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
+            "id": new_user_id,
+            "username": username,
+            "email": email,
             "firstName": first_name,
             "lastName": last_name,
-            "birthday": user.birthday.isoformat() if user.birthday else None,
-            "faculty": user.faculty
+            "birthday": birthday_date,
+            "faculty": faculty
         }), 201
 
     except Exception as e:
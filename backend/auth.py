@@ -1,6 +1,9 @@
+import threading
+import time
 from functools import wraps
 from flask import request, jsonify, g
 import os
+from jwcrypto import jwk
 from keycloak.keycloak_openid import KeycloakOpenID
 from keycloak.keycloak_admin import KeycloakAdmin
 from dotenv import load_dotenv
@@ -25,22 +28,62 @@ realm_name = os.getenv("KEYCLOAK_REALM")
 admin_client_id = os.getenv("KEYCLOAK_ADMIN_CLIENT_ID")
 admin_client_secret = os.getenv("KEYCLOAK_ADMIN_CLIENT_SECRET")
 
-# Step 1: Get full token dict from Keycloak
 keycloak_openid_admin = KeycloakOpenID(
     server_url=server_url,
     client_id=admin_client_id,
     realm_name=realm_name,
     client_secret_key=admin_client_secret,
 )
-admin_token_dict = keycloak_openid_admin.token(grant_type="client_credentials")
 
-# Step 2: Initialize KeycloakAdmin with the full token
-keycloak_admin = KeycloakAdmin(
-    server_url=server_url,
-    realm_name=realm_name,
-    token=admin_token_dict,  # Pass the full token dict!
-    verify=True
-)
+class _LazyKeycloakAdmin:
+    """Fetches the client-credentials token on first use, not at import.
+
+    Importing this module used to block on a Keycloak round-trip before a
+    single request had been served; the token is now only requested when an
+    admin function is actually called.
+    """
+    _admin = None
+
+    def __getattr__(self, name):
+        if self._admin is None:
+            admin_token_dict = keycloak_openid_admin.token(grant_type="client_credentials")
+            self._admin = KeycloakAdmin(
+                server_url=server_url,
+                realm_name=realm_name,
+                token=admin_token_dict,  # Pass the full token dict!
+                verify=True
+            )
+        return getattr(self._admin, name)
+
+keycloak_admin = _LazyKeycloakAdmin()
+
+# -----------------------------
+# Realm JWKS cache
+# -----------------------------
+_JWKS_TTL = 300  # seconds; bounds how long a rotated-out key keeps verifying
+
+_jwks_lock = threading.Lock()
+_jwks_cache = (0.0, None)  # (expires_at, JWKSet)
+
+def _realm_jwks():
+    """The realm's published signing keys, memoized for a short TTL.
+
+    decode_token() without an explicit key re-fetches the JWKS endpoint on
+    every call; caching the built JWKSet keeps token verification fully
+    local, and the TTL picks up key rotation.
+    """
+    global _jwks_cache
+    now = time.monotonic()
+    with _jwks_lock:
+        expires_at, keyset = _jwks_cache
+        if keyset is not None and expires_at > now:
+            return keyset
+    keyset = jwk.JWKSet()
+    for cert in keycloak_openid.certs()["keys"]:
+        keyset.add(jwk.JWK(**cert))
+    with _jwks_lock:
+        _jwks_cache = (now + _JWKS_TTL, keyset)
+    return keyset
 
 # -----------------------------
 # Decorator for protected routes
@@ -54,9 +97,24 @@ def keycloak_protect(f):
         if not auth_header or not auth_header.startswith("Bearer "):
             return jsonify({"error": "Missing or invalid Authorization header"}), 401
 
-        access_token = auth_header.split(" ")[1]
+        # partition allocates no list, and g.access_token is the single
+        # place handlers read the token from
+        access_token = auth_header.partition(" ")[2]
         g.access_token = access_token
 
+        # Fast path: verify the JWT signature locally against the cached
+        # realm keys and read the claims straight from the token — no
+        # Keycloak round-trip per request. Only the decode sits in the
+        # try: an exception from the handler itself must propagate, not
+        # trigger the fallback and run the handler a second time.
+        try:
+            g.user = keycloak_openid.decode_token(access_token, key=_realm_jwks())
+        except Exception:
+            pass  # e.g. key rotation or opaque token: fall back to userinfo
+        else:
+            request.user = g.user
+            return f(*args, **kwargs)
+
         try:
             g.user = keycloak_openid.userinfo(access_token)
         except Exception as e:
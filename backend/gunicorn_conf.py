@@ -0,0 +1,10 @@
+import multiprocessing
+
+# The workload is almost entirely I/O (PostgreSQL, Keycloak HTTP), so gevent
+# workers let concurrent requests overlap their waits instead of blocking
+# the single-threaded Werkzeug dev server.
+bind = "0.0.0.0:8000"
+worker_class = "gevent"
+workers = multiprocessing.cpu_count() * 2 + 1
+worker_connections = 1000
+keepalive = 5
@@ -6,7 +6,7 @@ CREATE TABLE IF NOT EXISTS users (
     username VARCHAR(100) NOT NULL UNIQUE,
     email VARCHAR(150) NOT NULL UNIQUE,
     birthday DATE,                       -- optional
-    faculty VARCHAR(150)                  -- optional
+    faculty VARCHAR(100)                  -- optional
 );
 
 -- -----------------------------
@@ -17,7 +17,8 @@ CREATE TABLE IF NOT EXISTS groups (
     name VARCHAR(150) NOT NULL,
     description TEXT,
     group_number INT NOT NULL,
-    invite_link VARCHAR(200) NOT NULL
+    invite_link VARCHAR(200) NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()  -- change marker for conditional GETs
 );
 
 -- -----------------------------
@@ -29,6 +30,10 @@ CREATE TABLE IF NOT EXISTS user_groups (
     PRIMARY KEY (user_id, group_id)
 );
 
+-- member listings filter by group_id; the composite PK only serves
+-- user_id-first lookups
+CREATE INDEX IF NOT EXISTS ix_user_groups_group_id ON user_groups (group_id);
+
 -- -----------------------------
 -- Tasks Table
 -- -----------------------------
@@ -40,8 +45,41 @@ CREATE TABLE IF NOT EXISTS tasks (
     priority VARCHAR(20) NOT NULL,
     status VARCHAR(20) NOT NULL DEFAULT 'todo', -- todo / in_progress / done
     progress INT NOT NULL DEFAULT 0,
-    user_id VARCHAR(50) REFERENCES users(id),
-    group_id INT REFERENCES groups(id),
+    user_id VARCHAR(50) REFERENCES users(id) ON DELETE CASCADE,
+    group_id INT REFERENCES groups(id) ON DELETE CASCADE,
     assignee VARCHAR(100),  -- optional
-    notes TEXT               -- optional
+    notes TEXT,              -- optional
+    updated_at TIMESTAMP NOT NULL DEFAULT now()  -- change marker for conditional GETs
 );
+
+-- backs the INSERT ... ON CONFLICT duplicate handling in create_task_service.
+-- COALESCE expression index instead of a plain UNIQUE constraint: PG14
+-- treats NULLs as distinct, so personal tasks (group_id IS NULL) would
+-- never conflict on the raw columns
+CREATE UNIQUE INDEX IF NOT EXISTS uq_tasks_dedupe
+    ON tasks (title, deadline, COALESCE(user_id, ''), COALESCE(group_id, 0));
+
+-- cover the OR-filter in get_tasks_for_user
+CREATE INDEX IF NOT EXISTS ix_tasks_user_id ON tasks (user_id);
+CREATE INDEX IF NOT EXISTS ix_tasks_group_id ON tasks (group_id);
+
+-- -----------------------------
+-- Upgrade path
+-- -----------------------------
+-- This script only runs against a fresh database (the docker db-data
+-- volume persists across restarts). Databases provisioned from an older
+-- schema.sql need the statements below applied by hand:
+--
+--   ALTER TABLE groups ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT now();
+--   ALTER TABLE tasks  ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT now();
+--   ALTER TABLE tasks  DROP CONSTRAINT tasks_user_id_fkey,
+--                      ADD CONSTRAINT tasks_user_id_fkey
+--                          FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+--   ALTER TABLE tasks  DROP CONSTRAINT tasks_group_id_fkey,
+--                      ADD CONSTRAINT tasks_group_id_fkey
+--                          FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE;
+--   CREATE UNIQUE INDEX uq_tasks_dedupe
+--       ON tasks (title, deadline, COALESCE(user_id, ''), COALESCE(group_id, 0));
+--   CREATE INDEX ix_tasks_user_id ON tasks (user_id);
+--   CREATE INDEX ix_tasks_group_id ON tasks (group_id);
+--   CREATE INDEX ix_user_groups_group_id ON user_groups (group_id);
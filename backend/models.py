@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
@@ -7,8 +9,11 @@ db = SQLAlchemy()
 # -----------------------------
 user_groups = db.Table(
     'user_groups',
-    db.Column('user_id', db.String(50), db.ForeignKey('users.id'), primary_key=True),
-    db.Column('group_id', db.Integer, db.ForeignKey('groups.id'), primary_key=True)
+    db.Column('user_id', db.String(50), db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('group_id', db.Integer, db.ForeignKey('groups.id', ondelete='CASCADE'), primary_key=True),
+    # The composite PK only serves user_id-first lookups; member listings
+    # filter by group_id and need their own index.
+    db.Index('ix_user_groups_group_id', 'group_id'),
 )
 
 # -----------------------------
@@ -23,10 +28,16 @@ class User(db.Model):
     faculty = db.Column(db.String(100), nullable=True)
 
     # Many-to-many: groups
-    groups = db.relationship('Group', secondary=user_groups, back_populates='members')
+    # selectin: the per-user group listing serializes every group anyway,
+    # so fetch them in one IN-query alongside the user instead of lazily.
+    groups = db.relationship('Group', secondary=user_groups, back_populates='members', lazy='selectin',
+                             passive_deletes=True)
 
     # One-to-many: tasks assigned to this user
-    tasks = db.relationship('Task', back_populates='user', cascade='all, delete-orphan')
+    # passive_deletes: the FK's ON DELETE CASCADE sweeps children in the
+    # database; don't load them just to delete them row by row.
+    tasks = db.relationship('Task', back_populates='user', cascade='all, delete-orphan',
+                            passive_deletes=True)
 
 
 # -----------------------------
@@ -39,12 +50,18 @@ class Group(db.Model):
     description = db.Column(db.Text, nullable=True)
     group_number = db.Column(db.Integer, nullable=False)
     invite_link = db.Column(db.String(200), nullable=False)
+    # Bumped on every write; cheap change marker for conditional GETs
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Many-to-many: users
-    members = db.relationship('User', secondary=user_groups, back_populates='groups')
+    # selectin: group listings always serialize members, so load them in one
+    # extra IN-query instead of one lazy SELECT per group (N+1).
+    members = db.relationship('User', secondary=user_groups, back_populates='groups', lazy='selectin',
+                              passive_deletes=True)
 
     # One-to-many: tasks belonging to this group
-    tasks = db.relationship('Task', back_populates='group', cascade='all, delete-orphan')
+    tasks = db.relationship('Task', back_populates='group', cascade='all, delete-orphan',
+                            passive_deletes=True)
 
 
 # -----------------------------
@@ -52,6 +69,23 @@ class Group(db.Model):
 # -----------------------------
 class Task(db.Model):
     __tablename__ = 'tasks'
+    # Backs the INSERT ... ON CONFLICT duplicate handling in create_task_service;
+    # the FK indexes cover the OR-filter in get_tasks_for_user.
+    # uq_tasks_dedupe is a COALESCE expression index rather than a plain
+    # UNIQUE constraint: Postgres 14 treats NULLs as distinct, so personal
+    # tasks (group_id IS NULL) would never conflict on the raw columns.
+    # The sentinels ('' / 0) collide with no real Keycloak sub or serial id.
+    __table_args__ = (
+        db.Index(
+            'uq_tasks_dedupe',
+            'title', 'deadline',
+            db.text("COALESCE(user_id, '')"),
+            db.text("COALESCE(group_id, 0)"),
+            unique=True,
+        ),
+        db.Index('ix_tasks_user_id', 'user_id'),
+        db.Index('ix_tasks_group_id', 'group_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(150), nullable=False)
     deadline = db.Column(db.Date, nullable=False)
@@ -61,11 +95,17 @@ class Task(db.Model):
     progress = db.Column(db.Integer, nullable=False, default=0)
     assignee = db.Column(db.String(100), nullable=True)
     notes = db.Column(db.Text, nullable=True)
+    # Bumped on every write; cheap change marker for conditional GETs
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Foreign keys
-    user_id = db.Column(db.String(50), db.ForeignKey('users.id'), nullable=True)
-    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=True)
+    user_id = db.Column(db.String(50), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id', ondelete='CASCADE'), nullable=True)
 
     # Relationships
-    user = db.relationship('User', back_populates='tasks')
-    group = db.relationship('Group', back_populates='tasks')
+    # raise: nothing serializes task.user today; raising on accidental
+    # traversal surfaces a would-be N+1 in tests instead of in production.
+    user = db.relationship('User', back_populates='tasks', lazy='raise')
+    # joined: task_to_dict serializes the owning group, so fetch it in the
+    # same SELECT instead of lazily per task.
+    group = db.relationship('Group', back_populates='tasks', lazy='joined')
@@ -1,13 +1,16 @@
-from datetime import datetime, date
-from sqlalchemy import and_
-from .models import db, User, Group, Task
+from datetime import date
+from sqlalchemy import and_, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from .models import db, User, Group, Task, user_groups
 
 VALID_PRIORITIES = ['low', 'medium', 'high']
+# Transition sets are frozensets: membership tests are O(1) and the
+# mapping is immutable shared state.
 VALID_STATUSES = {
-    'todo': ['in_progress'],
-    'in_progress': ['done', 'blocked'],
-    'blocked': ['in_progress'],
-    'done': []
+    'todo': frozenset(['in_progress']),
+    'in_progress': frozenset(['done', 'blocked']),
+    'blocked': frozenset(['in_progress']),
+    'done': frozenset()
 }
 
 # -----------------------------
@@ -22,7 +25,7 @@ def get_or_create_user_from_keycloak(keycloak_userinfo):
     if not user_id:
         raise Exception("Missing Keycloak user ID (sub)")
 
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
     if not user:
         user = User(id=user_id, username=username, email=email)
         db.session.add(user)
@@ -32,37 +35,108 @@ def get_or_create_user_from_keycloak(keycloak_userinfo):
 
 def get_user_service(user_id: str):
     """Get a user by ID or raise."""
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
     if not user:
         raise Exception(f"User with id {user_id} does not exist")
     return user
 
 
+def user_exists(user_id: str) -> bool:
+    """Single-column existence probe; no full row hydration."""
+    return db.session.execute(
+        select(User.id).where(User.id == user_id).limit(1)
+    ).scalar() is not None
+
+
+def _is_group_member(user_id: str, group_id: int) -> bool:
+    """EXISTS probe against the membership table.
+
+    The database answers with one boolean instead of shipping every
+    membership row over just to scan it in Python.
+    """
+    probe = (
+        select(user_groups.c.user_id)
+        .where(and_(
+            user_groups.c.user_id == user_id,
+            user_groups.c.group_id == group_id,
+        ))
+        .exists()
+    )
+    return bool(db.session.execute(select(probe)).scalar())
+
+
+def _assignee_probe(user_id: str, group_id: int):
+    """(exists, is_member) for a prospective assignee, in one roundtrip.
+
+    Combines the user-existence and group-membership EXISTS subqueries
+    into a single SELECT; probing them separately paid one network
+    roundtrip per boolean.
+    """
+    user_probe = select(User.id).where(User.id == user_id).exists()
+    member_probe = (
+        select(user_groups.c.user_id)
+        .where(and_(
+            user_groups.c.user_id == user_id,
+            user_groups.c.group_id == group_id,
+        ))
+        .exists()
+    )
+    return db.session.execute(select(user_probe, member_probe)).one()
+
+
 # -----------------------------
 # Task Services
 # -----------------------------
+def _parse_deadline(value: str):
+    """Parse a YYYY-MM-DD deadline and reject past dates.
+
+    date.fromisoformat is a C fast path for exactly this format;
+    strptime interprets a format string and builds a throwaway datetime
+    on every call.
+    """
+    deadline = date.fromisoformat(value)
+    if deadline < date.today():
+        raise ValueError("Deadline cannot be in the past")
+    return deadline
+
+
+# Must match the uq_tasks_dedupe expression index in models.py verbatim,
+# or Postgres cannot infer the index for ON CONFLICT.
+_DEDUPE_INDEX_ELEMENTS = (
+    text('title'),
+    text('deadline'),
+    text("COALESCE(user_id, '')"),
+    text("COALESCE(group_id, 0)"),
+)
+
+
+def _upsert_task(values):
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING in one roundtrip.
+
+    Returns the newly created Task, or None when the uq_tasks_dedupe
+    index swallowed the insert (an identical task already exists).
+    The conflict target names the index expressions rather than the
+    raw columns so duplicates with NULL user_id/group_id still match.
+    """
+    stmt = (
+        pg_insert(Task)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=_DEDUPE_INDEX_ELEMENTS)
+        .returning(Task)
+    )
+    return db.session.execute(stmt).scalars().first()
+
+
 def create_task_service(data):
     # Validate deadline
-    deadline_date = datetime.strptime(data['deadline'], '%Y-%m-%d').date()
-    if deadline_date < date.today():
-        raise ValueError("Deadline cannot be in the past")
+    deadline_date = _parse_deadline(data['deadline'])
 
     user_id = data.get('user_id')  # string
     group_id = data.get('group_id')
 
-    # check for existing duplicate task
-    existing_task = Task.query.filter(
-        and_(
-            Task.title == data['title'],
-            Task.deadline == deadline_date,
-            Task.user_id == user_id,
-            Task.group_id == group_id
-        )
-    ).first()
-    if existing_task:
-        return existing_task
-
-    task = Task(
+    # Atomic duplicate handling: one upsert statement instead of a racy
+    # SELECT-then-INSERT pair.
+    task = _upsert_task(dict(
         title=data['title'],
         deadline=deadline_date,
         kind=data['kind'],
@@ -73,14 +147,26 @@ def create_task_service(data):
         assignee=data.get('assignee'),
         notes=data.get('notes'),
         progress=data.get('progress', 0)
-    )
-    db.session.add(task)
+    ))
+    if task is None:
+        # Conflict: resolve the existing task by id only, then fetch via
+        # the PK so the identity map can serve an already-loaded object.
+        existing_id = db.session.execute(
+            select(Task.id).where(and_(
+                Task.title == data['title'],
+                Task.deadline == deadline_date,
+                Task.user_id == user_id,
+                Task.group_id == group_id
+            )).limit(1)
+        ).scalar()
+        return db.session.get(Task, existing_id) if existing_id else None
+
     db.session.commit()
     return task
 
 
 def update_task_service(task_id, data):
-    task = Task.query.get(task_id)
+    task = db.session.get(Task, task_id)
     if not task:
         raise Exception(f"Task with id {task_id} does not exist")
 
@@ -88,7 +174,7 @@ def update_task_service(task_id, data):
     if 'status' in data:
         current_status = task.status
         new_status = data['status']
-        if new_status not in VALID_STATUSES.get(current_status, []):
+        if new_status not in VALID_STATUSES.get(current_status, ()):
             raise ValueError(f"Invalid status transition from {current_status} to {new_status}")
 
     # Validate progress
@@ -102,12 +188,17 @@ def update_task_service(task_id, data):
         if data['priority'] not in VALID_PRIORITIES:
             raise ValueError(f"Invalid priority value. Must be one of: {VALID_PRIORITIES}")
 
-    # Validate assignee
+    # Validate assignee with index probes instead of hydrating the user
+    # and lazy-loading all of their memberships
     if 'assignee' in data:
-        assignee = User.query.get(data['assignee'])
-        if not assignee:
+        assignee_id = data['assignee']
+        if task.group_id:
+            user_found, is_member = _assignee_probe(assignee_id, task.group_id)
+        else:
+            user_found, is_member = user_exists(assignee_id), True
+        if not user_found:
             raise ValueError("Assignee user not found")
-        if task.group_id and task.group_id not in [g.id for g in assignee.groups]:
+        if not is_member:
             raise ValueError("Assignee must be member of the group")
 
     # Update fields
@@ -116,28 +207,61 @@ def update_task_service(task_id, data):
             setattr(task, field, data[field])
 
     if 'deadline' in data:
-        deadline_date = datetime.strptime(data['deadline'], '%Y-%m-%d').date()
-        if deadline_date < date.today():
-            raise ValueError("Deadline cannot be in the past")
-        task.deadline = deadline_date
+        task.deadline = _parse_deadline(data['deadline'])
 
     db.session.commit()
     return task
 
 
 def get_tasks_for_user(user_id: str):
-    user = User.query.get(user_id)
-    if not user:
+    """Rows of task data visible to a user (own tasks plus group tasks).
+
+    Selects exactly the columns the list endpoints serialize, with the
+    owning group joined in, instead of hydrating full ORM objects whose
+    identity-map bookkeeping is thrown away right after serialization.
+    Group membership is resolved via a scalar subquery so the whole
+    listing is one roundtrip.
+    """
+    if not user_exists(user_id):
         return []
 
-    group_ids = [g.id for g in user.groups]
-    return Task.query.filter(
-        (Task.user_id == user_id) | (Task.group_id.in_(group_ids))
-    ).all()
+    # Membership resolves server-side in the same statement; no second
+    # roundtrip and no ORM hydration of the membership rows.
+    membership = (
+        select(user_groups.c.group_id)
+        .where(user_groups.c.user_id == user_id)
+        .scalar_subquery()
+    )
+    stmt = (
+        select(
+            Task.id, Task.title, Task.deadline, Task.kind, Task.priority,
+            Task.status, Task.progress, Task.assignee,
+            Group.id.label('group_pk'), Group.name.label('group_name'),
+        )
+        .outerjoin(Group, Task.group_id == Group.id)
+        .where((Task.user_id == user_id) | (Task.group_id.in_(membership)))
+    )
+    return db.session.execute(stmt).all()
+
+
+def create_tasks_bulk(rows):
+    """Insert many task rows in one executemany-style statement.
+
+    For imports and other multi-task writes: SQLAlchemy sends this
+    through insertmanyvalues, batching hundreds of rows per INSERT
+    instead of paying one roundtrip per task.
+    """
+    if not rows:
+        return 0
+    db.session.execute(insert(Task), rows)
+    db.session.commit()
+    return len(rows)
 
 
 def get_all_tasks():
-    return Task.query.all()
+    # Server-side cursor in 1000-row batches: peak memory is one batch,
+    # not the whole table, and fetching overlaps with serialization.
+    return Task.query.execution_options(stream_results=True).yield_per(1000)
 
 
 # -----------------------------
@@ -164,15 +288,17 @@ def create_group_service(data):
 
 
 def join_group_service(user_id: str, group_id: int):
-    user = User.query.get(user_id)
-    group = Group.query.get(group_id)
+    user = db.session.get(User, user_id)
+    group = db.session.get(Group, group_id)
 
     if not user:
         raise Exception(f"User with id {user_id} does not exist")
     if not group:
         raise Exception(f"Group with id {group_id} does not exist")
 
-    if group in user.groups:
+    # EXISTS probe: the planner stops at the first matching membership row
+    # instead of loading the user's whole group collection for an `in` test.
+    if _is_group_member(user_id, group_id):
         return group
 
     user.groups.append(group)
@@ -181,9 +307,24 @@ def join_group_service(user_id: str, group_id: int):
 
 
 def get_all_groups():
-    return Group.query.all()
+    return Group.query.execution_options(stream_results=True).yield_per(1000)
+
+
+def get_group_member_index():
+    """group_id -> list of member user ids, from one membership-table scan.
+
+    The group listing only serializes member ids; reading them off
+    user_groups directly skips hydrating every member's User row through
+    the relationship.
+    """
+    index = {}
+    for group_id, user_id in db.session.execute(
+        select(user_groups.c.group_id, user_groups.c.user_id)
+    ):
+        index.setdefault(group_id, []).append(user_id)
+    return index
 
 
 def get_groups_for_user(user_id: str):
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
     return user.groups if user else []
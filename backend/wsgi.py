@@ -0,0 +1,26 @@
+"""Production WSGI entrypoint.
+
+Run with: gunicorn -c backend/gunicorn_conf.py backend.wsgi:app
+"""
+
+# gevent monkey-patching must happen before anything else is imported so the
+# stdlib sockets used by requests/Keycloak calls become cooperative.
+from gevent import monkey
+monkey.patch_all()
+
+# psycopg2 is a C extension; patch its wait callback so PostgreSQL I/O
+# yields to the gevent hub as well.
+from psycogreen.gevent import patch_psycopg
+patch_psycopg()
+
+from .api import app  # noqa: E402
+from .models import db  # noqa: E402
+
+# Idempotent table creation, mirroring the dev entrypoint in api.py: a
+# fresh database gets its schema on boot instead of 500ing until someone
+# runs schema.sql by hand. (Existing tables are left untouched; see the
+# upgrade notes in init-db/schema.sql for column/constraint changes.)
+with app.app_context():
+    db.create_all()
+
+__all__ = ["app"]
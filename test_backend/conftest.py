@@ -0,0 +1,46 @@
+import copy
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+
+def make_fake_db():
+    """Fake of the services.db surface the tests exercise."""
+    session = SimpleNamespace(add=Mock(), commit=Mock(), get=Mock(), execute=Mock())
+    return SimpleNamespace(session=session)
+
+
+@pytest.fixture(scope="session")
+def _db_template():
+    # Mock construction is the expensive part of the fake; build it once
+    # per session and hand tests a reset view of it.
+    return make_fake_db()
+
+
+@pytest.fixture
+def fake_db(_db_template):
+    """Per-test fake db: shared template with call state and stubs cleared."""
+    db = copy.copy(_db_template)
+    for mock in vars(db.session).values():
+        mock.reset_mock(return_value=True, side_effect=True)
+    return db
+
+
+@pytest.fixture
+def mock_db_get(fake_db):
+    """Configure fake_db.session.get from a by-id dict, a call list, or a callable.
+
+    Replaces the per-test `side_effect = lambda model, pk: ...` boilerplate.
+    """
+    def _setup(spec):
+        if isinstance(spec, dict):
+            fake_db.session.get.side_effect = lambda model, pk: spec.get(pk)
+        elif isinstance(spec, (list, tuple)):
+            # hand Mock an iterator so each call is a next() instead of
+            # list bookkeeping
+            fake_db.session.get.side_effect = iter(spec)
+        else:
+            fake_db.session.get.side_effect = spec
+        return fake_db
+    return _setup
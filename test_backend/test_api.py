@@ -1,4 +1,7 @@
+from types import SimpleNamespace
+
 import pytest
+from backend import api, auth
 from backend.api import task_to_dict, group_to_dict, app
 
 class DummyTask:
@@ -58,4 +61,37 @@ def test_refresh_missing_token(client):
     response = client.post("/api/refresh", json={})
     assert response.status_code == 400
     data = response.get_json()
-    assert data["error"] == "Missing refresh token"
\ No newline at end of file
+    assert data["error"] == "Missing refresh token"
+
+# Regression: /api/tasks serves per-user bodies at one URL, so a 304 minted
+# for one user's ETag must never be handed to a different user.
+def test_get_tasks_304_is_per_user(client, monkeypatch):
+    # auth fast path: the bearer token doubles as the Keycloak sub
+    monkeypatch.setattr(auth, "_realm_jwks", lambda: None)
+    monkeypatch.setattr(auth.keycloak_openid, "decode_token",
+                        lambda token, **kwargs: {"sub": token})
+    # constant table state, so the version aggregates never change between calls
+    version = SimpleNamespace(one=lambda: ("2025-01-01", 3, "2025-01-01", 2))
+    monkeypatch.setattr(api, "db",
+                        SimpleNamespace(session=SimpleNamespace(execute=lambda stmt: version)))
+    monkeypatch.setattr(api, "get_or_create_user_from_keycloak",
+                        lambda userinfo: SimpleNamespace(id=userinfo["sub"]))
+    monkeypatch.setattr(api, "get_tasks_for_user", lambda uid: [])
+
+    first = client.get("/api/tasks", headers={"Authorization": "Bearer user-a"})
+    first.get_data()  # drain the stream so its request context is released
+    assert first.status_code == 200
+    assert first.headers["Vary"] == "Authorization"
+    etag = first.headers["ETag"]
+
+    # the same user revalidates to 304
+    again = client.get("/api/tasks",
+                       headers={"Authorization": "Bearer user-a", "If-None-Match": etag})
+    again.get_data()
+    assert again.status_code == 304
+
+    # a different user presenting user-a's tag must get a full response
+    other = client.get("/api/tasks",
+                       headers={"Authorization": "Bearer user-b", "If-None-Match": etag})
+    other.get_data()
+    assert other.status_code == 200
\ No newline at end of file
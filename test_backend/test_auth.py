@@ -1,5 +1,6 @@
 import pytest
 from flask import Flask
+from backend import auth
 from backend.auth import keycloak_protect
 
 # Tests the decorator when the Authorization header is completely missing.
@@ -21,7 +22,6 @@ def test_keycloak_protect_invalid_header(monkeypatch):
     app = Flask(__name__)
 
     # Mock KeycloakOpenID.userinfo to simulate a token validation failure
-    from backend import auth
     monkeypatch.setattr(auth.keycloak_openid, "userinfo", lambda token: (_ for _ in ()).throw(Exception("invalid")))
 
     @app.route("/secure")
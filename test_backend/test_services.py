@@ -1,6 +1,5 @@
-import os
-import sys
-from types import SimpleNamespace, ModuleType
+from contextlib import contextmanager
+from types import SimpleNamespace
 from unittest.mock import Mock
 from datetime import date, datetime
 import pytest
@@ -26,56 +25,110 @@ class FakeUser:
         self.email = email
         self.groups = []
 
-def make_fake_db():
-    session = SimpleNamespace(add=Mock(), commit=Mock())
-    return SimpleNamespace(session=session)
+def make_streaming_query(rows):
+    """Fake the execution_options(...).yield_per(...) streaming chain."""
+    return SimpleNamespace(
+        execution_options=lambda **kw: SimpleNamespace(yield_per=lambda n: rows)
+    )
 
-# Install a fake 'models' module into sys.modules so services can import it
-fake_models = ModuleType("models")
-fake_models.db = make_fake_db()
-fake_models.User = FakeUser
-fake_models.Group = SimpleNamespace()
-fake_models.Task = SimpleNamespace()
-sys.modules["models"] = fake_models
+def _fake_query(first=None, all=None):
+    """Fake the filter(...).first()/.all() query chain with fixed results."""
+    ns = SimpleNamespace(first=lambda: first, all=lambda: all)
+    return SimpleNamespace(filter=lambda *a, **k: ns, all=lambda: all)
+
+@contextmanager
+def assert_db_unchanged(db):
+    """Assert the wrapped block performs no writes through the fake session.
+
+    Snapshots add/commit on entry so earlier setup calls can't leak into
+    the assertion."""
+    db.session.add.reset_mock()
+    db.session.commit.reset_mock()
+    yield
+    assert db.session.add.call_count == 0
+    assert db.session.commit.call_count == 0
+
+# helper types to emulate SQLAlchemy column expression behavior,
+# defined once instead of rebuilt inside each test function
+class DummyExpr:
+    def __or__(self, other):
+        return self
+
+class DummyColumn:
+    def __eq__(self, other):
+        return DummyExpr()
+    def in_(self, seq):
+        return DummyExpr()
+    def label(self, name):
+        return self
 
 class FakeTask:
     query = None
     # Class-level attributes für SQLAlchemy-Style Vergleiche
-    title = object()
-    deadline = object()
-    user_id = object()
-    group_id = object()
-    status = object()
-    progress = object()
-    priority = object()
-    assignee = object()
+    id = DummyColumn()
+    title = DummyColumn()
+    deadline = DummyColumn()
+    kind = DummyColumn()
+    user_id = DummyColumn()
+    group_id = DummyColumn()
+    status = DummyColumn()
+    progress = DummyColumn()
+    priority = DummyColumn()
+    assignee = DummyColumn()
+
+    def __init__(self, **kwargs):
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+
+class FakeGroup:
+    query = None
+    id = DummyColumn()
+    name = DummyColumn()
+    group_number = DummyColumn()
+    invite_link = DummyColumn()
 
     def __init__(self, **kwargs):
         for k, v in kwargs.items():
             setattr(self, k, v)
 
+class FrozenDate(date):
+    """date stand-in with a fixed today() so deadline checks are deterministic."""
+    @classmethod
+    def today(cls):
+        return date(2025, 1, 1)
 
-def test_get_or_create_user_from_keycloak_returns_existing_user():
+@pytest.fixture
+def frozen_today(monkeypatch):
+    monkeypatch.setattr(services, "date", FrozenDate, raising=False)
+
+@pytest.fixture(autouse=True)
+def _bind_fakes(monkeypatch):
+    """Point services at the module-level fakes for every test by default.
+
+    Tests needing a different stand-in simply re-patch on top."""
+    monkeypatch.setattr(services, "User", FakeUser)
+    monkeypatch.setattr(services, "Task", FakeTask)
+    monkeypatch.setattr(services, "Group", FakeGroup)
+
+
+def test_get_or_create_user_from_keycloak_returns_existing_user(monkeypatch, fake_db):
     existing = FakeUser(id="u1", username="alice", email="alice@example.com")
-    FakeUser.query = SimpleNamespace(get=lambda uid: existing)
-    services.User = FakeUser
-    services.db = make_fake_db()
+    monkeypatch.setattr(services, "db", fake_db)
+    services.db.session.get.return_value = existing
 
-    result = services.get_or_create_user_from_keycloak({
-        "sub": "u1",
-        "preferred_username": "alice",
-        "email": "alice@example.com"
-    })
+    with assert_db_unchanged(fake_db):
+        result = services.get_or_create_user_from_keycloak({
+            "sub": "u1",
+            "preferred_username": "alice",
+            "email": "alice@example.com"
+        })
 
     assert result is existing
-    assert services.db.session.add.call_count == 0
-    assert services.db.session.commit.call_count == 0
 
 
-def test_get_or_create_user_from_keycloak_creates_and_commits_new_user():
-    FakeUser.query = SimpleNamespace(get=lambda uid: None)
-    services.User = FakeUser
-    services.db = make_fake_db()
+def test_get_or_create_user_from_keycloak_creates_and_commits_new_user(monkeypatch, fake_db):
+    monkeypatch.setattr(services, "db", fake_db)
+    services.db.session.get.return_value = None
 
     kc_info = {"sub": "u2", "preferred_username": "bob", "email": "bob@example.com"}
 
@@ -89,9 +142,8 @@ def test_get_or_create_user_from_keycloak_creates_and_commits_new_user():
     services.db.session.commit.assert_called_once()
 
 
-def test_get_or_create_user_from_keycloak_raises_on_missing_sub():
-    services.User = FakeUser
-    services.db = make_fake_db()
+def test_get_or_create_user_from_keycloak_raises_on_missing_sub(monkeypatch, fake_db):
+    monkeypatch.setattr(services, "db", fake_db)
 
     with pytest.raises(Exception) as excinfo:
         services.get_or_create_user_from_keycloak({"email": "noid@example.com"})
@@ -101,18 +153,18 @@ def test_get_or_create_user_from_keycloak_raises_on_missing_sub():
 # -----------------------------
 # Tests for get_user_service
 # -----------------------------
-def test_get_user_service_returns_user_when_exists():
+def test_get_user_service_returns_user_when_exists(monkeypatch, fake_db, mock_db_get):
     existing = FakeUser(id="u10", username="carol", email="carol@example.com")
-    FakeUser.query = SimpleNamespace(get=lambda uid: existing if uid == "u10" else None)
-    services.User = FakeUser
+    monkeypatch.setattr(services, "db", fake_db)
+    mock_db_get({"u10": existing})
 
     result = services.get_user_service("u10")
 
     assert result is existing
 
-def test_get_user_service_raises_when_not_exists():
-    FakeUser.query = SimpleNamespace(get=lambda uid: None)
-    services.User = FakeUser
+def test_get_user_service_raises_when_not_exists(monkeypatch, fake_db):
+    monkeypatch.setattr(services, "db", fake_db)
+    services.db.session.get.return_value = None
 
     with pytest.raises(Exception) as excinfo:
         services.get_user_service("missing")
@@ -122,7 +174,7 @@ def test_get_user_service_raises_when_not_exists():
 # -----------------------------
 # Tests for create_task_service (fixed: provide class-level attributes used in comparisons)
 # -----------------------------
-def test_create_task_service_returns_existing_task(monkeypatch):
+def test_create_task_service_returns_existing_task(monkeypatch, fake_db, frozen_today, mock_db_get):
     data = {
         "title": "Homework",
         "deadline": "2025-10-30",
@@ -139,24 +191,21 @@ def test_create_task_service_returns_existing_task(monkeypatch):
         group_id=1
     )
 
-    # filter(...).first() should return existing_task
-    FakeTask.query = SimpleNamespace(filter=lambda *a, **k: SimpleNamespace(first=lambda: existing_task))
-    services.Task = FakeTask
-    services.db = make_fake_db()
-
-    class FakeDate(date):
-        @classmethod
-        def today(cls):
-            return date(2025, 1, 1)
-    monkeypatch.setattr(services, "date", FakeDate, raising=False)
-
-    result = services.create_task_service(data)
+    # upsert hits the conflict (returns None); the id-only lookup then
+    # resolves the existing task through the identity map
+    monkeypatch.setattr(services, "db", fake_db)
+    monkeypatch.setattr(services, "_upsert_task", lambda values: None)
+    monkeypatch.setattr(services, "select", Mock())
+    monkeypatch.setattr(services, "and_", Mock())
+    services.db.session.execute.return_value = SimpleNamespace(scalar=lambda: "t-dup")
+    mock_db_get({"t-dup": existing_task})
+
+    with assert_db_unchanged(fake_db):
+        result = services.create_task_service(data)
     assert result is existing_task
-    assert services.db.session.add.call_count == 0
-    assert services.db.session.commit.call_count == 0
 
 
-def test_create_task_service_creates_and_commits_new_task(monkeypatch):
+def test_create_task_service_creates_and_commits_new_task(monkeypatch, fake_db, frozen_today):
     data = {
         "title": "Project",
         "deadline": "2025-11-01",
@@ -169,16 +218,9 @@ def test_create_task_service_creates_and_commits_new_task(monkeypatch):
         "progress": 20
     }
 
-    # filter(...).first() returns None (no duplicate)
-    FakeTask.query = SimpleNamespace(filter=lambda *a, **k: SimpleNamespace(first=lambda: None))
-    services.Task = FakeTask
-    services.db = make_fake_db()
-
-    class FakeDate(date):
-        @classmethod
-        def today(cls):
-            return date(2025, 1, 1)
-    monkeypatch.setattr(services, "date", FakeDate, raising=False)
+    # upsert inserts without conflict and hands the new task back
+    monkeypatch.setattr(services, "db", fake_db)
+    monkeypatch.setattr(services, "_upsert_task", lambda values: FakeTask(**values))
 
     result = services.create_task_service(data)
 
@@ -193,21 +235,13 @@ def test_create_task_service_creates_and_commits_new_task(monkeypatch):
     assert result.notes == "Do research"
     assert result.progress == 20
 
-    services.db.session.add.assert_called_once_with(result)
     services.db.session.commit.assert_called_once()
 
 
 # -----------------------------
 # Tests for update_task_service
 # -----------------------------
-def test_update_task_service_updates_fields_and_deadline(monkeypatch):
-    # prepare fake task class and existing instance
-    class FakeTask:
-        query = None
-        def __init__(self, **kwargs):
-            for k, v in kwargs.items():
-                setattr(self, k, v)
-
+def test_update_task_service_updates_fields_and_deadline(monkeypatch, fake_db, frozen_today, mock_db_get):
     existing = FakeTask(
         id="t1",
         title="Old Title",
@@ -221,16 +255,8 @@ def test_update_task_service_updates_fields_and_deadline(monkeypatch):
         notes="old",
         progress=0
     )
-
-    FakeTask.query = SimpleNamespace(get=lambda tid: existing if tid == "t1" else None)
-    services.Task = FakeTask
-    services.db = make_fake_db()
-
-    class FakeDate(date):
-        @classmethod
-        def today(cls):
-            return date(2025, 1, 1)
-    monkeypatch.setattr(services, "date", FakeDate, raising=False)
+    monkeypatch.setattr(services, "db", fake_db)
+    mock_db_get({"t1": existing})
 
     update_data = {
         "title": "New Title",
@@ -253,13 +279,9 @@ def test_update_task_service_updates_fields_and_deadline(monkeypatch):
     services.db.session.commit.assert_called_once()
 
 
-def test_update_task_service_raises_when_task_not_found():
-    class FakeTask:
-        query = None
-
-    FakeTask.query = SimpleNamespace(get=lambda tid: None)
-    services.Task = FakeTask
-    services.db = make_fake_db()
+def test_update_task_service_raises_when_task_not_found(monkeypatch, fake_db):
+    monkeypatch.setattr(services, "db", fake_db)
+    services.db.session.get.return_value = None
 
     with pytest.raises(Exception) as excinfo:
         services.update_task_service("missing-id", {"title": "x"})
@@ -269,99 +291,71 @@ def test_update_task_service_raises_when_task_not_found():
 # -----------------------------
 # Tests for get_tasks_for_user
 # -----------------------------
-def test_get_tasks_for_user_returns_tasks_for_user_and_group():
-    # helper types to emulate SQLAlchemy column expression behavior
-    class DummyExpr:
-        def __or__(self, other):
-            return self
-    class DummyColumn:
-        def __eq__(self, other):
-            return DummyExpr()
-        def in_(self, seq):
-            return DummyExpr()
-
-    # prepare user with one group
-    group = SimpleNamespace(id=2)
-    user = FakeUser(id="u5", username="eve", email="eve@example.com")
-    user.groups = [group]
-    FakeUser.query = SimpleNamespace(get=lambda uid: user if uid == "u5" else None)
-    services.User = FakeUser
-
-    # fake Task class and two tasks: one owned by user, one belonging to group
-    class FakeTask:
-        # provide dummy columns so expressions like Task.user_id and Task.group_id.in_(...) work
-        user_id = DummyColumn()
-        group_id = DummyColumn()
-        query = None
-        def __init__(self, **kwargs):
-            for k, v in kwargs.items():
-                setattr(self, k, v)
-
-    task_user = FakeTask(id="t1", user_id="u5", group_id=3)
-    task_group = FakeTask(id="t2", user_id="other", group_id=2)
-
-    # Task.query.filter(...).all() returns both tasks
-    FakeTask.query = SimpleNamespace(filter=lambda *a, **k: SimpleNamespace(all=lambda: [task_user, task_group]))
-    services.Task = FakeTask
+def test_get_tasks_for_user_returns_tasks_for_user_and_group(monkeypatch, fake_db):
+    # the module-level FakeTask/FakeGroup dummy columns make the select()
+    # expressions work; only db, user_exists and select need patching here
+    monkeypatch.setattr(services, "db", fake_db)
+    monkeypatch.setattr(services, "user_exists", lambda uid: uid == "u5")
+    monkeypatch.setattr(services, "select", Mock())
+
+    # two result rows: one owned by the user, one belonging to the group
+    row_user = SimpleNamespace(id="t1", user_id="u5", group_id=3)
+    row_group = SimpleNamespace(id="t2", user_id="other", group_id=2)
+    services.db.session.execute.return_value = SimpleNamespace(all=lambda: [row_user, row_group])
 
     result = services.get_tasks_for_user("u5")
-    assert result == [task_user, task_group]
+    assert result == [row_user, row_group]
 
-def test_get_tasks_for_user_returns_empty_list_when_user_missing():
-    FakeUser.query = SimpleNamespace(get=lambda uid: None)
-    services.User = FakeUser
+def test_get_tasks_for_user_returns_empty_list_when_user_missing(monkeypatch, fake_db):
+    monkeypatch.setattr(services, "db", fake_db)
+    monkeypatch.setattr(services, "user_exists", lambda uid: False)
 
     result = services.get_tasks_for_user("nope")
     assert result == []
 
 # -----------------------------
-# Tests for get_all_tasks
+# Tests for create_tasks_bulk
 # -----------------------------
-def test_get_all_tasks_returns_all_tasks():
-    class FakeTask:
-        query = None
-        def __init__(self, **kwargs):
-            for k, v in kwargs.items():
-                setattr(self, k, v)
-
-    t1 = FakeTask(id="a")
-    t2 = FakeTask(id="b")
-    FakeTask.query = SimpleNamespace(all=lambda: [t1, t2])
-    services.Task = FakeTask
+def test_create_tasks_bulk_inserts_all_rows_in_one_statement(monkeypatch, fake_db):
+    monkeypatch.setattr(services, "db", fake_db)
+    monkeypatch.setattr(services, "insert", Mock())
+
+    rows = [
+        {"title": "A", "kind": "homework", "priority": "low"},
+        {"title": "B", "kind": "project", "priority": "high"},
+    ]
+    result = services.create_tasks_bulk(rows)
+
+    assert result == 2
+    services.db.session.execute.assert_called_once()
+    services.db.session.commit.assert_called_once()
 
-    result = services.get_all_tasks()
-    assert result == [t1, t2]
 
-def test_get_all_tasks_returns_empty_list_when_none():
-    class FakeTask:
-        query = None
-    FakeTask.query = SimpleNamespace(all=lambda: [])
-    services.Task = FakeTask
+def test_create_tasks_bulk_is_a_noop_for_empty_input(monkeypatch, fake_db):
+    monkeypatch.setattr(services, "db", fake_db)
+
+    result = services.create_tasks_bulk([])
+
+    assert result == 0
+    assert services.db.session.execute.call_count == 0
+    assert services.db.session.commit.call_count == 0
+
+
+# -----------------------------
+# Tests for get_all_tasks
+# -----------------------------
+@pytest.mark.parametrize("ids", [["a", "b"], []])
+def test_get_all_tasks_returns_all_tasks(ids, monkeypatch):
+    tasks = [FakeTask(id=i) for i in ids]
+    monkeypatch.setattr(FakeTask, "query", make_streaming_query(tasks))
 
     result = services.get_all_tasks()
-    assert result == []
+    assert list(result) == tasks
 
 # -----------------------------
 # Tests for create_group_service
 # -----------------------------
-def test_create_group_service_returns_existing_group():
-    # helper type to emulate SQLAlchemy column expression behavior
-    class DummyExpr:
-        def __or__(self, other):
-            return self
-    class DummyColumn:
-        def __eq__(self, other):
-            return DummyExpr()
-
-    # fake Group class with necessary column attributes
-    class FakeGroup:
-        group_number = DummyColumn()
-        invite_link = DummyColumn()
-        query = None
-        def __init__(self, **kwargs):
-            for k, v in kwargs.items():
-                setattr(self, k, v)
-
+def test_create_group_service_returns_existing_group(monkeypatch, fake_db):
     existing_group = FakeGroup(
         name="Study Group A",
         description="Test group",
@@ -370,9 +364,8 @@ def test_create_group_service_returns_existing_group():
     )
 
     # filter(...).first() returns existing group
-    FakeGroup.query = SimpleNamespace(filter=lambda *a, **k: SimpleNamespace(first=lambda: existing_group))
-    services.Group = FakeGroup
-    services.db = make_fake_db()
+    monkeypatch.setattr(FakeGroup, "query", _fake_query(first=existing_group))
+    monkeypatch.setattr(services, "db", fake_db)
 
     data = {
         "name": "Study Group A",
@@ -381,33 +374,15 @@ def test_create_group_service_returns_existing_group():
         "inviteLink": "link123"
     }
 
-    result = services.create_group_service(data)
+    with assert_db_unchanged(fake_db):
+        result = services.create_group_service(data)
     assert result is existing_group
-    assert services.db.session.add.call_count == 0
-    assert services.db.session.commit.call_count == 0
-
-
-def test_create_group_service_creates_and_commits_new_group():
-    # helper type for SQLAlchemy expressions
-    class DummyExpr:
-        def __or__(self, other):
-            return self
-    class DummyColumn:
-        def __eq__(self, other):
-            return DummyExpr()
 
-    class FakeGroup:
-        group_number = DummyColumn()
-        invite_link = DummyColumn()
-        query = None
-        def __init__(self, **kwargs):
-            for k, v in kwargs.items():
-                setattr(self, k, v)
 
+def test_create_group_service_creates_and_commits_new_group(monkeypatch, fake_db):
     # filter(...).first() returns None (no duplicate)
-    FakeGroup.query = SimpleNamespace(filter=lambda *a, **k: SimpleNamespace(first=lambda: None))
-    services.Group = FakeGroup
-    services.db = make_fake_db()
+    monkeypatch.setattr(FakeGroup, "query", _fake_query())
+    monkeypatch.setattr(services, "db", fake_db)
 
     data = {
         "name": "New Study Group",
@@ -431,26 +406,14 @@ def test_create_group_service_creates_and_commits_new_group():
 # -----------------------------
 # Tests for join_group_service
 # -----------------------------
-def test_join_group_service_adds_user_to_group():
+def test_join_group_service_adds_user_to_group(monkeypatch, fake_db, mock_db_get):
     # Setup fake user and group
     user = FakeUser(id="u7", username="frank", email="frank@example.com")
     user.groups = []
-    
-    class FakeGroup:
-        query = None
-        def __init__(self, **kwargs):
-            for k, v in kwargs.items():
-                setattr(self, k, v)
-
     group = FakeGroup(id=3, name="Test Group")
-
-    # Setup queries
-    FakeUser.query = SimpleNamespace(get=lambda uid: user if uid == "u7" else None)
-    FakeGroup.query = SimpleNamespace(get=lambda gid: group if gid == 3 else None)
-    
-    services.User = FakeUser
-    services.Group = FakeGroup
-    services.db = make_fake_db()
+    monkeypatch.setattr(services, "db", fake_db)
+    mock_db_get([user, group])
+    monkeypatch.setattr(services, "_is_group_member", lambda uid, gid: False)
 
     result = services.join_group_service("u7", 3)
 
@@ -459,26 +422,14 @@ def test_join_group_service_adds_user_to_group():
     services.db.session.commit.assert_called_once()
 
 
-def test_join_group_service_returns_group_if_already_member():
+def test_join_group_service_returns_group_if_already_member(monkeypatch, fake_db, mock_db_get):
     # Setup fake user already in group
     user = FakeUser(id="u8", username="grace", email="grace@example.com")
-    
-    class FakeGroup:
-        query = None
-        def __init__(self, **kwargs):
-            for k, v in kwargs.items():
-                setattr(self, k, v)
-
     group = FakeGroup(id=4, name="Existing Group")
     user.groups = [group]  # User is already in group
-
-    # Setup queries
-    FakeUser.query = SimpleNamespace(get=lambda uid: user if uid == "u8" else None)
-    FakeGroup.query = SimpleNamespace(get=lambda gid: group if gid == 4 else None)
-    
-    services.User = FakeUser
-    services.Group = FakeGroup
-    services.db = make_fake_db()
+    monkeypatch.setattr(services, "db", fake_db)
+    mock_db_get([user, group])
+    monkeypatch.setattr(services, "_is_group_member", lambda uid, gid: True)
 
     result = services.join_group_service("u8", 4)
 
@@ -486,26 +437,20 @@ def test_join_group_service_returns_group_if_already_member():
     assert services.db.session.commit.call_count == 0
 
 
-def test_join_group_service_raises_when_user_not_found():
-    FakeUser.query = SimpleNamespace(get=lambda uid: None)
-    services.User = FakeUser
+def test_join_group_service_raises_when_user_not_found(monkeypatch, fake_db, mock_db_get):
+    monkeypatch.setattr(services, "db", fake_db)
+    mock_db_get([None, None])
 
     with pytest.raises(Exception) as excinfo:
         services.join_group_service("missing", 1)
     assert "User with id missing does not exist" in str(excinfo.value)
 
 
-def test_join_group_service_raises_when_group_not_found():
+def test_join_group_service_raises_when_group_not_found(monkeypatch, fake_db, mock_db_get):
     # User exists but group doesn't
     user = FakeUser(id="u9")
-    FakeUser.query = SimpleNamespace(get=lambda uid: user if uid == "u9" else None)
-    
-    class FakeGroup:
-        query = None
-    FakeGroup.query = SimpleNamespace(get=lambda gid: None)
-    
-    services.User = FakeUser
-    services.Group = FakeGroup
+    monkeypatch.setattr(services, "db", fake_db)
+    mock_db_get([user, None])
 
     with pytest.raises(Exception) as excinfo:
         services.join_group_service("u9", 999)
@@ -517,100 +462,85 @@ def test_join_group_service_raises_when_group_not_found():
 # -----------------------------
 # Tests for get_all_groups
 # -----------------------------
-def test_get_all_groups_returns_all_groups():
-    class FakeGroup:
-        query = None
-        def __init__(self, **kwargs):
-            for k, v in kwargs.items():
-                setattr(self, k, v)
-
-    g1 = FakeGroup(id=1, name="Group A")
-    g2 = FakeGroup(id=2, name="Group B")
-    FakeGroup.query = SimpleNamespace(all=lambda: [g1, g2])
-    services.Group = FakeGroup
-
-    result = services.get_all_groups()
-    
-    assert result == [g1, g2]
-    assert len(result) == 2
-    assert result[0].name == "Group A"
-    assert result[1].name == "Group B"
+@pytest.mark.parametrize("names", [["Group A", "Group B"], []])
+def test_get_all_groups_returns_all_groups(names, monkeypatch):
+    groups = [FakeGroup(id=i, name=n) for i, n in enumerate(names, 1)]
+    monkeypatch.setattr(FakeGroup, "query", make_streaming_query(groups))
 
+    result = list(services.get_all_groups())
 
-def test_get_all_groups_returns_empty_list_when_none():
-    class FakeGroup:
-        query = None
-    FakeGroup.query = SimpleNamespace(all=lambda: [])
-    services.Group = FakeGroup
+    assert result == groups
+    assert [g.name for g in result] == names
 
-    result = services.get_all_groups()
-    assert result == []
+
+def test_get_group_member_index_groups_ids_by_group(monkeypatch, fake_db):
+    monkeypatch.setattr(services, "db", fake_db)
+    services.db.session.execute.return_value = [
+        (1, "u1"), (1, "u2"), (2, "u1"),
+    ]
+
+    result = services.get_group_member_index()
+
+    assert result == {1: ["u1", "u2"], 2: ["u1"]}
 
 
 # -----------------------------
 # Tests for get_groups_for_user
 # -----------------------------
-def test_get_groups_for_user_returns_user_groups():
+@pytest.mark.parametrize("names", [["Group A", "Group B"], []])
+def test_get_groups_for_user_returns_user_groups(monkeypatch, names, fake_db, mock_db_get):
     # Setup fake user with groups
-    class FakeGroup:
-        def __init__(self, id, name):
-            self.id = id
-            self.name = name
-
-    g1 = FakeGroup(1, "Group A")
-    g2 = FakeGroup(2, "Group B")
-    
     user = FakeUser(id="u10", username="harry", email="harry@example.com")
-    user.groups = [g1, g2]
-
-    FakeUser.query = SimpleNamespace(get=lambda uid: user if uid == "u10" else None)
-    services.User = FakeUser
+    user.groups = [FakeGroup(id=i, name=n) for i, n in enumerate(names, 1)]
+    monkeypatch.setattr(services, "db", fake_db)
+    mock_db_get({"u10": user})
 
     result = services.get_groups_for_user("u10")
-    
-    assert result == [g1, g2]
-    assert len(result) == 2
-    assert result[0].name == "Group A"
-    assert result[1].name == "Group B"
-
 
-def test_get_groups_for_user_returns_empty_list_when_user_not_found():
-    FakeUser.query = SimpleNamespace(get=lambda uid: None)
-    services.User = FakeUser
-
-    result = services.get_groups_for_user("missing")
-    assert result == []
+    assert result == user.groups
+    assert [g.name for g in result] == names
 
 
-def test_get_groups_for_user_returns_empty_list_when_user_has_no_groups():
-    user = FakeUser(id="u11", username="ian", email="ian@example.com")
-    user.groups = []
-    
-    FakeUser.query = SimpleNamespace(get=lambda uid: user if uid == "u11" else None)
-    services.User = FakeUser
+def test_get_groups_for_user_returns_empty_list_when_user_not_found(monkeypatch, fake_db):
+    monkeypatch.setattr(services, "db", fake_db)
+    services.db.session.get.return_value = None
 
-    result = services.get_groups_for_user("u11")
+    result = services.get_groups_for_user("missing")
     assert result == []
 
 # -----------------------------
 # Entity-specific validation tests
 # -----------------------------
-def test_update_task_service_validates_status_transition():
-    task = FakeTask(id="t3", status="todo")
-    FakeTask.query = SimpleNamespace(get=lambda tid: task)
-    services.Task = FakeTask
-    services.db = make_fake_db()
-
-    # Valid transition todo -> in_progress
-    services.update_task_service("t3", {"status": "in_progress"})
-    assert task.status == "in_progress"
+@pytest.mark.parametrize("task_kwargs, update", [
+    ({"id": "t3", "status": "todo"}, {"status": "in_progress"}),
+    ({"id": "t5", "priority": "low"}, {"priority": "high"}),
+])
+def test_update_task_service_accepts_valid_values(monkeypatch, task_kwargs, update, fake_db):
+    task = FakeTask(**task_kwargs)
+    monkeypatch.setattr(services, "db", fake_db)
+    services.db.session.get.return_value = task
+
+    services.update_task_service(task_kwargs["id"], update)
+
+    for field, value in update.items():
+        assert getattr(task, field) == value
+
+
+@pytest.mark.parametrize("task_kwargs, update, expected_msg", [
+    ({"id": "t3", "status": "in_progress"}, {"status": "cancelled"}, "Invalid status transition"),
+    ({"id": "t4", "progress": 50}, {"progress": 101}, "Progress must be between 0 and 100"),
+    ({"id": "t5", "priority": "low"}, {"priority": "super-high"}, "Invalid priority value"),
+])
+def test_update_task_service_rejects_invalid_values(monkeypatch, task_kwargs, update, expected_msg, fake_db):
+    task = FakeTask(**task_kwargs)
+    monkeypatch.setattr(services, "db", fake_db)
+    services.db.session.get.return_value = task
 
-    # Invalid transition in_progress -> cancelled
     with pytest.raises(ValueError) as excinfo:
-        services.update_task_service("t3", {"status": "cancelled"})
-    assert "Invalid status transition" in str(excinfo.value)
+        services.update_task_service(task_kwargs["id"], update)
+    assert expected_msg in str(excinfo.value)
 
-def test_create_task_service_validates_due_date(monkeypatch):
+def test_create_task_service_validates_due_date(monkeypatch, fake_db, frozen_today):
     data = {
         "title": "Past Task",
         "deadline": "2020-01-01",  # Past date
@@ -618,72 +548,27 @@ def test_create_task_service_validates_due_date(monkeypatch):
         "priority": "high"
     }
     
-    FakeTask.query = MockQuery()
-    services.Task = FakeTask
-    services.db = make_fake_db()
-
-    class FakeDate(date):
-        @classmethod
-        def today(cls):
-            return date(2024, 1, 1)
-    monkeypatch.setattr(services, "date", FakeDate, raising=False)
+    monkeypatch.setattr(FakeTask, "query", MockQuery())
+    monkeypatch.setattr(services, "db", fake_db)
     
     with pytest.raises(ValueError) as excinfo:
         services.create_task_service(data)
     assert "Deadline cannot be in the past" in str(excinfo.value)
 
-def test_update_task_service_validates_progress():
-    task = FakeTask(id="t4", progress=50)
-    FakeTask.query = SimpleNamespace(get=lambda tid: task)
-    services.Task = FakeTask
-    services.db = make_fake_db()
-
-    # Invalid progress value
-    with pytest.raises(ValueError) as excinfo:
-        services.update_task_service("t4", {"progress": 101})
-    assert "Progress must be between 0 and 100" in str(excinfo.value)
-
-def test_task_priority_management():
-    task = FakeTask(id="t5", priority="low")
-    FakeTask.query = SimpleNamespace(get=lambda tid: task)
-    services.Task = FakeTask
-    services.db = make_fake_db()
-
-    # Valid priority update
-    services.update_task_service("t5", {"priority": "high"})
-    assert task.priority == "high"
-
-    # Invalid priority value
-    with pytest.raises(ValueError) as excinfo:
-        services.update_task_service("t5", {"priority": "super-high"})
-    assert "Invalid priority value" in str(excinfo.value)
-
 # Fix the task assignment validation test
-def test_task_assignment_validation():
-    # Create two users - one in group, one not
-    group_user = FakeUser(id="u12")
-    other_user = FakeUser(id="other-user")
-    group = SimpleNamespace(id=5)
-    group_user.groups = [group]
-    other_user.groups = []  # not in the group
-    
+def test_task_assignment_validation(monkeypatch, fake_db, mock_db_get):
     task = FakeTask(
-        id="t6", 
+        id="t6",
         group_id=5,
         assignee=None
     )
-    
-    # Setup query to return either user based on id
-    FakeUser.query = SimpleNamespace(
-        get=lambda uid: {
-            "u12": group_user,
-            "other-user": other_user
-        }.get(uid)
+    monkeypatch.setattr(services, "db", fake_db)
+    mock_db_get({"t6": task})
+    # Both users exist, but only u12 is a member of group 5
+    monkeypatch.setattr(
+        services, "_assignee_probe",
+        lambda uid, gid: (uid in ("u12", "other-user"), uid == "u12" and gid == 5),
     )
-    FakeTask.query = SimpleNamespace(get=lambda tid: task)
-    services.Task = FakeTask
-    services.User = FakeUser
-    services.db = make_fake_db()
 
     # First verify we can assign to user in group
     services.update_task_service("t6", {"assignee": "u12"})